@@ -0,0 +1,173 @@
+import contextlib
+import fcntl
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+
+# Record header: magic, image id, compressed length
+RECORD_HEADER = struct.Struct('<4sQI')
+RECORD_MAGIC = b'TGPK'
+PACK_NAME = re.compile(r'^pack-(\d{6})\.tgp$')
+
+class ImageArchive:
+    """
+    Append-only compressed pack files for cold image data.
+
+    Each record is a small header followed by the zlib-compressed image data.
+    The database keeps the (pack_id, offset, length) pointer for each record,
+    which acts as the offset index. Packs are rolled over once they reach
+    max_pack_bytes and are never modified afterwards, so backups only need
+    to copy new packs. Records of deleted images are reclaimed by copying
+    the live records of a sealed pack forward and removing the old pack
+    (see compact_packs in app.py).
+    """
+
+    def __init__(self, pack_dir: str, max_pack_bytes: int = 256 * 1024 * 1024):
+        self.pack_dir = pack_dir
+        self.max_pack_bytes = max_pack_bytes
+        self._lock = threading.Lock()
+        self._maps: dict[int, mmap.mmap] = {}
+        os.makedirs(pack_dir, exist_ok=True)
+
+    def _pack_path(self, pack_id: int) -> str:
+        return os.path.join(self.pack_dir, f'pack-{pack_id:06d}.tgp')
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """
+        Hold an exclusive lock on the pack directory. The thread lock covers
+        this process; flock covers other processes (e.g. overlapping jobs).
+        """
+        with self._lock, open(os.path.join(self.pack_dir, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def pack_ids(self) -> list[int]:
+        """Return the ids of all packs on disk, oldest first"""
+        return sorted(
+            int(match.group(1))
+            for match in map(PACK_NAME.match, os.listdir(self.pack_dir))
+            if match
+        )
+
+    def pack_size(self, pack_id: int) -> int:
+        return os.path.getsize(self._pack_path(pack_id))
+
+    def sealed_pack_ids(self) -> list[int]:
+        """
+        Return the ids of packs that can be rewritten: every pack but the
+        newest, which may still be appended to. Keeping the newest pack also
+        means pack ids are never reused.
+        """
+        with self._locked():
+            return self.pack_ids()[:-1]
+
+    def _current_pack(self) -> int:
+        """Return the id of the pack new records should be appended to"""
+        pack_ids = self.pack_ids()
+        if not pack_ids:
+            return 1
+        latest = max(pack_ids)
+        if os.path.getsize(self._pack_path(latest)) >= self.max_pack_bytes:
+            return latest + 1
+        return latest
+
+    def append(self, records: list[tuple[int, str]]) -> list[tuple[int, int, int]]:
+        """
+        Compress and append (image_id, image_data) records, returning a
+        (pack_id, offset, length) pointer for each one. Data is fsynced
+        before returning, so callers can safely drop the hot copy.
+        """
+        pointers = []
+        # The pack is picked and its size read under the lock, so concurrent
+        # writers can never record overlapping offsets
+        with self._locked():
+            pack_id = self._current_pack()
+            pack = open(self._pack_path(pack_id), 'ab')
+            try:
+                offset = pack.tell()
+                for image_id, image_data in records:
+                    if offset >= self.max_pack_bytes:
+                        pack.flush()
+                        os.fsync(pack.fileno())
+                        pack.close()
+                        pack_id += 1
+                        pack = open(self._pack_path(pack_id), 'ab')
+                        offset = pack.tell()
+
+                    payload = zlib.compress(image_data.encode('utf-8'))
+                    pack.write(RECORD_HEADER.pack(RECORD_MAGIC, image_id, len(payload)))
+                    pack.write(payload)
+
+                    record_length = RECORD_HEADER.size + len(payload)
+                    pointers.append((pack_id, offset, record_length))
+                    offset += record_length
+
+                pack.flush()
+                os.fsync(pack.fileno())
+            finally:
+                pack.close()
+        return pointers
+
+    def _map(self, pack_id: int, end: int) -> mmap.mmap:
+        """
+        Return a read-only mapping of a pack that covers at least `end` bytes.
+        Callers must hold self._lock and stop using the mapping when they
+        release it, since mappings are closed here.
+        """
+        # Packs may have been removed by compaction in another process; an
+        # open mapping would keep their disk space allocated
+        for cached_id in list(self._maps):
+            if not os.path.exists(self._pack_path(cached_id)):
+                self._maps.pop(cached_id).close()
+
+        mapped = self._maps.get(pack_id)
+        # The newest pack may have grown since it was mapped
+        if mapped is None or len(mapped) < end:
+            if mapped is not None:
+                mapped.close()
+            with open(self._pack_path(pack_id), 'rb') as pack:
+                mapped = mmap.mmap(pack.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[pack_id] = mapped
+        return mapped
+
+    def read(self, pack_id: int, offset: int, length: int, image_id: int = None) -> str:
+        """Read and decompress one record from a pack"""
+        with self._lock:
+            mapped = self._map(pack_id, offset + length)
+            magic, stored_id, payload_length = RECORD_HEADER.unpack_from(mapped, offset)
+
+            if magic != RECORD_MAGIC or RECORD_HEADER.size + payload_length != length:
+                raise ValueError(f'Corrupt pack record at pack {pack_id} offset {offset}')
+            if image_id is not None and stored_id != image_id:
+                raise ValueError(f'Pack record at pack {pack_id} offset {offset} belongs to image {stored_id}')
+
+            # Copy the payload out so the mapping can be closed once the lock is released
+            start = offset + RECORD_HEADER.size
+            payload = mapped[start:start + payload_length]
+        return zlib.decompress(payload).decode('utf-8')
+
+    def cached_pack_ids(self) -> list[int]:
+        """Return the ids of packs this process currently has mapped"""
+        with self._lock:
+            return sorted(self._maps)
+
+    def remove(self, pack_id: int):
+        """Delete a sealed pack once nothing in the database points into it"""
+        with self._locked():
+            mapped = self._maps.pop(pack_id, None)
+            if mapped is not None:
+                mapped.close()
+            os.remove(self._pack_path(pack_id))
+
+    def close(self):
+        with self._lock:
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
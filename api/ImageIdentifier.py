@@ -1,4 +1,3 @@
-from google.cloud import vision
 from time import time
 from ratelimit import limits, sleep_and_retry
 from google import genai
@@ -37,6 +36,8 @@ class ImageIdentifier:
         self.__check_limit()
         valid_names = {name.lower().strip() for name in valid_names}
     
+        # Vision SDK is only needed here, so don't pay for importing it up front
+        from google.cloud import vision
         client = vision.ImageAnnotatorClient()
         request: dict = {
             'image': {
@@ -0,0 +1,65 @@
+import base64
+import hashlib
+import io
+import os
+import re
+
+# Longest edge, in pixels, of each generated thumbnail
+THUMBNAIL_SIZES = (128, 256, 512)
+THUMBNAIL_HASH = re.compile(r'^[0-9a-f]{64}$')
+
+def thumbnail_path(thumb_dir: str, content_hash: str, size: int) -> str:
+    return os.path.join(thumb_dir, f'{content_hash}-{size}.jpg')
+
+def thumbnails_exist(thumb_dir: str, content_hash: str) -> bool:
+    return all(os.path.exists(thumbnail_path(thumb_dir, content_hash, size)) for size in THUMBNAIL_SIZES)
+
+def decode_image_data(image_data: str) -> bytes:
+    """Decode base64 image data, with or without a data: URL prefix"""
+    if image_data.startswith('data:'):
+        image_data = image_data.split(',', 1)[-1]
+    return base64.b64decode(image_data)
+
+def generate_thumbnails(image_data: str, thumb_dir: str) -> str:
+    """
+    Write a JPEG thumbnail for each of THUMBNAIL_SIZES and return the
+    content hash they are stored under. Runs in a worker process, so it
+    only takes and returns plain values.
+    """
+    raw = decode_image_data(image_data)
+    content_hash = hashlib.sha256(raw).hexdigest()
+
+    # Same content means same thumbnails, so there is nothing to do
+    if thumbnails_exist(thumb_dir, content_hash):
+        return content_hash
+
+    # Pillow is imported here so the API process doesn't load it just to serve files
+    from PIL import Image
+
+    os.makedirs(thumb_dir, exist_ok=True)
+    sizes = sorted(THUMBNAIL_SIZES, reverse=True)
+    with Image.open(io.BytesIO(raw)) as source:
+        # Let the JPEG decoder downscale while decoding, so the full-resolution
+        # bitmap is never built (no-op for other formats)
+        source.draft('RGB', (sizes[0], sizes[0]))
+        image = source.convert('RGB')
+
+    # Shrink in place, largest first, so each size is made from the previous one
+    for size in sizes:
+        image.thumbnail((size, size))
+
+        # Write to a temp file and rename so readers never see a partial file
+        path = thumbnail_path(thumb_dir, content_hash, size)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        image.save(temp_path, 'JPEG', quality=80, optimize=True)
+        os.replace(temp_path, path)
+
+    return content_hash
+
+def remove_thumbnails(thumb_dir: str, content_hash: str):
+    """Delete every size of the thumbnails stored under a content hash"""
+    for size in THUMBNAIL_SIZES:
+        try:
+            os.remove(thumbnail_path(thumb_dir, content_hash, size))
+        except FileNotFoundError:
+            pass
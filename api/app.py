@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
 import sqlite3
@@ -6,11 +6,17 @@ import secrets
 import datetime
 import os
 import re
+import hmac
+import hashlib
+import time
+import multiprocessing
+import importlib.util
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from werkzeug.datastructures import FileStorage
-from ImageIdentifier import ImageIdentifier
-from dotenv import load_dotenv
-
-load_dotenv()
+from ImageThumbnailer import THUMBNAIL_SIZES, THUMBNAIL_HASH, thumbnail_path, thumbnails_exist, generate_thumbnails, remove_thumbnails
 
 # Try to import rate limiter, but make it optional
 try:
@@ -22,6 +28,12 @@ except ImportError:
     print("Install with: pip install flask-limiter")
     LIMITER_AVAILABLE = False
 
+# Thumbnail generation needs Pillow, but make it optional
+THUMBNAILS_AVAILABLE = importlib.util.find_spec('PIL') is not None
+if not THUMBNAILS_AVAILABLE:
+    print("WARNING: Pillow not installed. Thumbnail generation disabled.")
+    print("Install with: pip install Pillow")
+
 # Try to load dotenv, but make it optional
 try:
     from dotenv import load_dotenv
@@ -38,8 +50,19 @@ SECRET_KEY = os.getenv('SECRET_KEY', secrets.token_hex(32))
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3001')
 DEBUG_MODE = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
 GEMINI_API_KEY = os.getenv('API_KEY')
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 50))
+MODEL_CONCURRENCY = int(os.getenv('MODEL_CONCURRENCY', 10))
+MAX_REQUEST_MB = int(os.getenv('MAX_REQUEST_MB', 64))
+PACK_DIR = os.getenv('PACK_DIR', 'packs')
+RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', 30))
+THUMBNAIL_DIR = os.path.abspath(os.getenv('THUMBNAIL_DIR', 'thumbnails'))
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+THUMBNAIL_URL_TTL = int(os.getenv('THUMBNAIL_URL_TTL', 86400))
 if (not GEMINI_API_KEY): raise 
 
+# Reject oversized bodies (e.g. huge batches) before they are read into memory
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_MB * 1024 * 1024
+
 # CORS configuration - restrict to specific origins
 allowed_origins = "any"
 if (DEBUG_MODE == False):
@@ -63,74 +86,348 @@ else:
             def decorator(f):
                 return f
             return decorator
+        def shared_limit(self, *args, **kwargs):
+            return self.limit()
+        def exempt(self, f):
+            return f
     limiter = DummyLimiter()
 
+# Image identifier is created lazily so workers that never call a model
+# don't pay for importing the Google SDKs at startup
+_image_identifier = None
+
+def get_image_identifier():
+    """Return the shared ImageIdentifier, importing the model SDKs on first use"""
+    global _image_identifier
+    if _image_identifier is None:
+        from ImageIdentifier import ImageIdentifier
+        identifier = ImageIdentifier(GEMINI_API_KEY)
+        # ImageIdentifier swallows client creation errors; don't cache a
+        # broken instance so the next request tries again
+        if getattr(identifier, 'gemini_client', None) is None:
+            return identifier
+        _image_identifier = identifier
+    return _image_identifier
+
+# Pack archive for cold image data, opened on first use
+_image_archive = None
+
+def get_image_archive():
+    """Return the shared ImageArchive for compacted image data"""
+    global _image_archive
+    if _image_archive is None:
+        from ImageArchive import ImageArchive
+        _image_archive = ImageArchive(PACK_DIR)
+    return _image_archive
+
+# Process pool for thumbnail generation, started on first upload
+_thumbnail_pool = None
+_thumbnail_pool_lock = threading.Lock()
+
+def get_thumbnail_pool(broken=None):
+    """
+    Return the shared process pool used to generate thumbnails. Pass the
+    pool that raised BrokenProcessPool as `broken` to replace it.
+    """
+    global _thumbnail_pool
+    with _thumbnail_pool_lock:
+        if _thumbnail_pool is not None and _thumbnail_pool is broken:
+            _thumbnail_pool.shutdown(wait=False, cancel_futures=True)
+            _thumbnail_pool = None
+        if _thumbnail_pool is None:
+            # Forking a multithreaded server process can deadlock; start
+            # workers fresh instead (they only take plain values)
+            _thumbnail_pool = ProcessPoolExecutor(
+                max_workers=THUMBNAIL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _thumbnail_pool
+
+# Global cap on concurrent verification and model calls, shared by all requests
+model_quota = threading.BoundedSemaphore(MODEL_CONCURRENCY)
+
 def get_db_connection():
     """Get database connection with Row factory for dict-like access"""
     conn = sqlite3.connect(DATABASE)
     conn.row_factory = sqlite3.Row
     return conn
 
+# Schema migrations, applied in order. The index of each entry + 1 is the
+# schema version it produces (stored in PRAGMA user_version). Never edit an
+# existing migration - append a new one instead.
+MIGRATIONS = [
+    # 1: initial schema
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS images (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            prompt TEXT NOT NULL,
+            image_data TEXT,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            session_token TEXT UNIQUE NOT NULL,
+            expires_at TIMESTAMP NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)',
+        'CREATE INDEX IF NOT EXISTS idx_sessions_token ON sessions(session_token)',
+        'CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_id)',
+        'CREATE INDEX IF NOT EXISTS idx_images_user ON images(user_id)',
+        'CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at)',
+    ],
+    # 2: pack pointers for image data compacted out of the hot database
+    [
+        'ALTER TABLE images ADD COLUMN pack_id INTEGER',
+        'ALTER TABLE images ADD COLUMN pack_offset INTEGER',
+        'ALTER TABLE images ADD COLUMN pack_length INTEGER',
+        'CREATE INDEX IF NOT EXISTS idx_images_created ON images(created_at)',
+    ],
+    # 3: content hash of generated thumbnails
+    [
+        'ALTER TABLE images ADD COLUMN thumbnail_hash TEXT',
+    ],
+    # 4: thumbnail ownership checks and cleanup look images up by hash
+    [
+        'CREATE INDEX IF NOT EXISTS idx_images_thumbnail ON images(thumbnail_hash)',
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
 def init_database():
-    """Initialize the database with required tables and indexes"""
+    """Bring the database schema up to date by applying pending migrations"""
     print(f"Initializing database at: {DATABASE}")
     
     try:
         conn = get_db_connection()
         
-        # Create users table
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_login TIMESTAMP
-            )
-        ''')
-        
-        # Create images table
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS images (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                prompt TEXT NOT NULL,
-                image_data TEXT,
-                status TEXT DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
-            )
-        ''')
-        
-        # Create sessions table for authentication
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                session_token TEXT UNIQUE NOT NULL,
-                expires_at TIMESTAMP NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
-            )
-        ''')
-        
-        # Create indexes for better performance
-        conn.execute('CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)')
-        conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_token ON sessions(session_token)')
-        conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_id)')
-        conn.execute('CREATE INDEX IF NOT EXISTS idx_images_user ON images(user_id)')
-        conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at)')
-        
-        conn.commit()
-        conn.close()
+        # Up-to-date schema costs a single pragma read
+        current_version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if current_version >= SCHEMA_VERSION:
+            conn.close()
+            print(f"✅ Database schema up to date (version {current_version})")
+            return
+        
+        # Take the write lock and re-check, since another worker may have
+        # migrated in the meantime. DDL is transactional inside an explicit
+        # transaction, so a crash leaves the schema and version unchanged.
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            current_version = conn.execute('PRAGMA user_version').fetchone()[0]
+            for version, statements in enumerate(MIGRATIONS[current_version:], start=current_version + 1):
+                for statement in statements:
+                    conn.execute(statement)
+                print(f"✅ Applied migration {version}")
+            
+            # PRAGMA doesn't accept bound parameters; SCHEMA_VERSION is an int
+            conn.execute(f'PRAGMA user_version = {max(current_version, SCHEMA_VERSION)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
         
-        print("✅ Database initialized successfully!")
-        print("✅ Tables created: users, images, sessions")
+        print(f"✅ Database initialized successfully! (schema version {SCHEMA_VERSION})")
         
     except Exception as e:
         print(f"❌ Error initializing database: {str(e)}")
         raise
 
+# Run on import so every worker (including under Gunicorn) has the current schema
+init_database()
+
+def get_image_data(image):
+    """Return an image row's data, reading it from its pack if it was compacted"""
+    if image['image_data'] is not None or image['pack_id'] is None:
+        return image['image_data']
+    return get_image_archive().read(
+        image['pack_id'], image['pack_offset'], image['pack_length'], image['id']
+    )
+
+def compact_images(older_than_days=RETENTION_DAYS, batch_size=100):
+    """Move image data older than the retention age into pack files"""
+    archive = get_image_archive()
+    compacted = 0
+    
+    conn = get_db_connection()
+    try:
+        while True:
+            rows = conn.execute('''
+                SELECT id, image_data
+                FROM images
+                WHERE image_data IS NOT NULL AND pack_id IS NULL
+                  AND created_at < datetime('now', ?)
+                ORDER BY id
+                LIMIT ?
+            ''', (f'-{int(older_than_days)} days', batch_size)).fetchall()
+            
+            if not rows:
+                break
+            
+            # Packs are fsynced before the hot copy is dropped, so a crash
+            # in between only leaves unreferenced bytes in a pack
+            pointers = archive.append([(row['id'], row['image_data']) for row in rows])
+            conn.executemany('''
+                UPDATE images
+                SET image_data = NULL, pack_id = ?, pack_offset = ?, pack_length = ?
+                WHERE id = ? AND pack_id IS NULL
+            ''', [pointer + (row['id'],) for row, pointer in zip(rows, pointers)])
+            conn.commit()
+            
+            compacted += len(rows)
+    finally:
+        conn.close()
+    
+    return compacted
+
+def schedule_thumbnails(image_id, image_data, attempt=1):
+    """
+    Generate thumbnails for an image in the background, off the request path.
+    Best-effort: errors are logged and never fail the upload that called this.
+    """
+    if not THUMBNAILS_AVAILABLE or not image_data:
+        return
+    
+    def store_thumbnail_hash(future):
+        try:
+            content_hash = future.result()
+            conn = get_db_connection()
+            result = conn.execute(
+                'UPDATE images SET thumbnail_hash = ? WHERE id = ?',
+                (content_hash, image_id)
+            )
+            conn.commit()
+            
+            if result.rowcount == 0:
+                # The image was deleted while its thumbnails were being made
+                delete_unused_thumbnails(conn, [content_hash])
+            elif not thumbnails_exist(THUMBNAIL_DIR, content_hash) and attempt < 3:
+                # Another image with the same content was deleted, and its
+                # thumbnails removed, before this hash was stored
+                schedule_thumbnails(image_id, image_data, attempt + 1)
+            conn.close()
+        except Exception as e:
+            print(f"Thumbnail generation error for image {image_id}: {str(e)}")
+    
+    try:
+        pool = get_thumbnail_pool()
+        try:
+            future = pool.submit(generate_thumbnails, image_data, THUMBNAIL_DIR)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); start a fresh pool and retry once
+            print("Thumbnail pool broken, restarting it")
+            future = get_thumbnail_pool(broken=pool).submit(generate_thumbnails, image_data, THUMBNAIL_DIR)
+        future.add_done_callback(store_thumbnail_hash)
+    except Exception as e:
+        print(f"Error scheduling thumbnails for image {image_id}: {str(e)}")
+
+def delete_unused_thumbnails(conn, content_hashes):
+    """Remove thumbnail files that no remaining image references"""
+    for content_hash in set(filter(None, content_hashes)):
+        try:
+            # Hold the write lock while checking and removing, so a thumbnail
+            # job storing this hash either lands first (and keeps the files)
+            # or sees the files gone afterwards (and makes them again)
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                in_use = conn.execute(
+                    'SELECT 1 FROM images WHERE thumbnail_hash = ? LIMIT 1',
+                    (content_hash,)
+                ).fetchone()
+                if not in_use:
+                    remove_thumbnails(THUMBNAIL_DIR, content_hash)
+            finally:
+                conn.rollback()
+        except Exception as e:
+            print(f"Error removing thumbnails {content_hash}: {str(e)}")
+
+def sign_thumbnail(content_hash, size, expires):
+    """Signature for a thumbnail link, so it works without an Authorization header"""
+    message = f'{content_hash}/{size}/{expires}'.encode()
+    return hmac.new(SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+def thumbnail_urls(content_hash):
+    """Build a signed, expiring thumbnail URL for each size, keyed by size"""
+    if not content_hash:
+        return None
+    # Expiry is rounded to the TTL so URLs stay the same (and cacheable)
+    # across page loads; every link is valid for at least one TTL
+    expires = (int(time.time()) // THUMBNAIL_URL_TTL + 2) * THUMBNAIL_URL_TTL
+    return {
+        size: f'/api/thumbnails/{content_hash}/{size}?expires={expires}&sig={sign_thumbnail(content_hash, size, expires)}'
+        for size in THUMBNAIL_SIZES
+    }
+
+def compact_packs(min_dead_ratio=0.0, batch_size=100):
+    """
+    Rewrite sealed packs that hold records of deleted images, so deleted
+    image data is actually removed from disk. Returns the bytes reclaimed.
+    """
+    archive = get_image_archive()
+    reclaimed = 0
+    
+    conn = get_db_connection()
+    try:
+        for pack_id in archive.sealed_pack_ids():
+            try:
+                size = archive.pack_size(pack_id)
+                live = conn.execute('''
+                    SELECT id, pack_offset, pack_length
+                    FROM images
+                    WHERE pack_id = ?
+                    ORDER BY pack_offset
+                ''', (pack_id,)).fetchall()
+                
+                dead = size - sum(row['pack_length'] for row in live)
+                if dead <= 0 or dead < size * min_dead_ratio:
+                    continue
+                
+                # Copy live records forward; as with compaction the new copy
+                # is fsynced before any pointer moves to it
+                for start in range(0, len(live), batch_size):
+                    rows = live[start:start + batch_size]
+                    pointers = archive.append([
+                        (row['id'], archive.read(pack_id, row['pack_offset'], row['pack_length'], row['id']))
+                        for row in rows
+                    ])
+                    conn.executemany('''
+                        UPDATE images
+                        SET pack_id = ?, pack_offset = ?, pack_length = ?
+                        WHERE id = ? AND pack_id = ?
+                    ''', [pointer + (row['id'], pack_id) for row, pointer in zip(rows, pointers)])
+                    conn.commit()
+                
+                archive.remove(pack_id)
+                reclaimed += dead
+                
+            except FileNotFoundError:
+                # Another compaction run already rewrote this pack
+                continue
+    finally:
+        conn.close()
+    
+    return reclaimed
+
 def validate_email(email):
     """Validate email format using regex"""
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -175,6 +472,40 @@ def cleanup_expired_sessions():
     except Exception as e:
         print(f"Error cleaning up sessions: {str(e)}")
 
+def validate_submission(prompt, image_data):
+    """Validate an image submission, returning an error message or None"""
+    if not isinstance(prompt, str):
+        return 'Prompt must be a string'
+    
+    prompt = prompt.strip()
+    if not prompt:
+        return 'Prompt is required'
+    
+    if not isinstance(image_data, str):
+        return 'Image data must be a base64 string'
+    
+    if len(prompt) > 500:
+        return 'Prompt is too long (max 500 characters)'
+    
+    # Limit image data size (5MB = ~6.7MB base64)
+    if len(image_data) > 7000000:
+        return 'Image data is too large (max 5MB)'
+    
+    return None
+
+def verify_submission(prompt, image_data):
+    """Verify a submission under the global model quota, returning its status"""
+    with model_quota:
+        # Simulate verification (replace with actual AI verification later)
+        return 'success' if random.random() > 0.2 else 'failure'
+
+def upload_cost():
+    """Rate limit cost of an upload request: one per image, so batches can't bypass the limit"""
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and isinstance(data.get('images'), list):
+        return max(len(data['images']), 1)
+    return 1
+
 def get_auth_token():
     """Extract and validate authorization token from request headers"""
     auth_header = request.headers.get('Authorization', '')
@@ -187,6 +518,10 @@ def get_auth_token():
 def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
 
+@app.errorhandler(413)
+def request_too_large(error):
+    return jsonify({'error': f'Request is too large (max {MAX_REQUEST_MB}MB)'}), 413
+
 @app.errorhandler(500)
 def internal_error(error):
     print(f"Internal error: {str(error)}")
@@ -390,7 +725,7 @@ def verify_auth():
 
 # Image/scavenger hunt endpoints
 @app.route('/api/images/upload', methods=['POST'])
-@limiter.limit("20 per hour")
+@limiter.shared_limit("20 per hour", scope="image-upload")
 def upload_image():
     """Upload image for scavenger hunt with authentication"""
     try:
@@ -403,30 +738,26 @@ def upload_image():
         if not user_info:
             return jsonify({'error': 'Invalid or expired session'}), 401
         
-        data = request.get_json()
+        data = request.get_json(silent=True)
         
         if not data:
             return jsonify({'error': 'No data provided'}), 400
         
-        prompt = data.get('prompt', '').strip()
-        image_data = data.get('image_data', '')
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
         
-        if not prompt:
-            return jsonify({'error': 'Prompt is required'}), 400
+        prompt = data.get('prompt', '')
+        image_data = data.get('image_data', '')
         
-        if len(prompt) > 500:
-            return jsonify({'error': 'Prompt is too long (max 500 characters)'}), 400
+        error = validate_submission(prompt, image_data)
+        if error:
+            return jsonify({'error': error}), 400
         
-        # Limit image data size (5MB = ~6.7MB base64)
-        if len(image_data) > 7000000:
-            return jsonify({'error': 'Image data is too large (max 5MB)'}), 400
+        prompt = prompt.strip()
+        status = verify_submission(prompt, image_data)
         
         conn = get_db_connection()
         
-        # Simulate verification (replace with actual AI verification later)
-        import random
-        status = 'success' if random.random() > 0.2 else 'failure'
-        
         cursor = conn.execute(
             'INSERT INTO images (user_id, prompt, image_data, status) VALUES (?, ?, ?, ?)',
             (user_info['user_id'], prompt, image_data, status)
@@ -436,6 +767,8 @@ def upload_image():
         conn.commit()
         conn.close()
         
+        schedule_thumbnails(image_id, image_data)
+        
         return jsonify({
             'message': 'Image uploaded successfully',
             'image_id': image_id,
@@ -447,6 +780,89 @@ def upload_image():
         print(f"Upload image error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/images/batch', methods=['POST'])
+@limiter.shared_limit("20 per hour", scope="image-upload", cost=upload_cost)
+def upload_images_batch():
+    """Upload many images in one request, stored in a single transaction"""
+    try:
+        session_token = get_auth_token()
+        
+        if not session_token:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        user_info = verify_session(session_token)
+        if not user_info:
+            return jsonify({'error': 'Invalid or expired session'}), 401
+        
+        data = request.get_json(silent=True)
+        
+        if not isinstance(data, dict) or not isinstance(data.get('images'), list):
+            return jsonify({'error': 'A list of images is required'}), 400
+        
+        items = data['images']
+        
+        if not items:
+            return jsonify({'error': 'A list of images is required'}), 400
+        
+        if len(items) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Too many images (max {MAX_BATCH_SIZE} per batch)'}), 400
+        
+        # Validate every item first; invalid ones get an error result
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results[index] = {'index': index, 'error': 'Invalid image entry'}
+                continue
+            prompt = item.get('prompt', '')
+            image_data = item.get('image_data', '')
+            error = validate_submission(prompt, image_data)
+            if error:
+                results[index] = {'index': index, 'error': error}
+            else:
+                valid.append((index, prompt.strip(), image_data))
+        
+        if not valid:
+            return jsonify({'error': 'No valid images in batch', 'results': results}), 400
+        
+        # Verify concurrently; model_quota caps work across all requests
+        with ThreadPoolExecutor(max_workers=min(len(valid), MODEL_CONCURRENCY)) as executor:
+            statuses = list(executor.map(
+                lambda entry: verify_submission(entry[1], entry[2]), valid
+            ))
+        
+        conn = get_db_connection()
+        
+        # Take the write lock up front so the new ids are contiguous
+        conn.execute('BEGIN IMMEDIATE')
+        conn.executemany(
+            'INSERT INTO images (user_id, prompt, image_data, status) VALUES (?, ?, ?, ?)',
+            [(user_info['user_id'], prompt, image_data, status)
+             for (_, prompt, image_data), status in zip(valid, statuses)]
+        )
+        last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+        conn.commit()
+        conn.close()
+        
+        first_id = last_id - len(valid) + 1
+        for offset, ((index, _, image_data), status) in enumerate(zip(valid, statuses)):
+            schedule_thumbnails(first_id + offset, image_data)
+            results[index] = {
+                'index': index,
+                'image_id': first_id + offset,
+                'status': status,
+                'success': status == 'success'
+            }
+        
+        return jsonify({
+            'message': f'{len(valid)} of {len(items)} images uploaded successfully',
+            'results': results
+        }), 201
+        
+    except Exception as e:
+        print(f"Batch upload error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/images/user', methods=['GET'])
 def get_user_images():
     """Get all images for authenticated user"""
@@ -462,7 +878,7 @@ def get_user_images():
         
         conn = get_db_connection()
         images = conn.execute('''
-            SELECT id, prompt, status, created_at 
+            SELECT id, prompt, status, created_at, thumbnail_hash 
             FROM images 
             WHERE user_id = ? 
             ORDER BY created_at DESC
@@ -470,13 +886,104 @@ def get_user_images():
         conn.close()
         
         return jsonify({
-            'images': [dict(image) for image in images]
+            'images': [
+                {**dict(image), 'thumbnails': thumbnail_urls(image['thumbnail_hash'])}
+                for image in images
+            ]
         }), 200
         
     except Exception as e:
         print(f"Get user images error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/images/<int:image_id>', methods=['GET'])
+def get_image(image_id):
+    """Get a specific image with its data (user can only view their own)"""
+    try:
+        session_token = get_auth_token()
+        
+        if not session_token:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        user_info = verify_session(session_token)
+        if not user_info:
+            return jsonify({'error': 'Invalid or expired session'}), 401
+        
+        conn = get_db_connection()
+        image = conn.execute('''
+            SELECT id, user_id, prompt, image_data, status, created_at,
+                   pack_id, pack_offset, pack_length
+            FROM images
+            WHERE id = ?
+        ''', (image_id,)).fetchone()
+        conn.close()
+        
+        if not image:
+            return jsonify({'error': 'Image not found'}), 404
+        
+        if image['user_id'] != user_info['user_id']:
+            return jsonify({'error': 'Unauthorized to view this image'}), 403
+        
+        return jsonify({
+            'id': image['id'],
+            'prompt': image['prompt'],
+            'status': image['status'],
+            'created_at': image['created_at'],
+            'image_data': get_image_data(image)
+        }), 200
+        
+    except Exception as e:
+        print(f"Get image error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/thumbnails/<content_hash>/<int:size>', methods=['GET'])
+@limiter.exempt
+def get_thumbnail(content_hash, size):
+    """Serve a thumbnail through a signed link from /api/images/user"""
+    try:
+        expires = request.args.get('expires', type=int)
+        sig = request.args.get('sig', '')
+        
+        if not THUMBNAIL_HASH.match(content_hash) or size not in THUMBNAIL_SIZES:
+            return jsonify({'error': 'Thumbnail not found'}), 404
+        
+        if (not expires or expires <= time.time()
+                or not hmac.compare_digest(sig, sign_thumbnail(content_hash, size, expires))):
+            return jsonify({'error': 'Invalid or expired thumbnail link'}), 403
+        
+        # Links outlive deletion, so check an image still uses these thumbnails
+        conn = get_db_connection()
+        in_use = conn.execute(
+            'SELECT 1 FROM images WHERE thumbnail_hash = ? LIMIT 1',
+            (content_hash,)
+        ).fetchone()
+        conn.close()
+        
+        path = thumbnail_path(THUMBNAIL_DIR, content_hash, size)
+        if not in_use or not os.path.exists(path):
+            return jsonify({'error': 'Thumbnail not found'}), 404
+        
+        # conditional=True handles Range and If-None-Match; the file is
+        # streamed with the server's file wrapper (sendfile under Gunicorn)
+        response = send_file(
+            path,
+            mimetype='image/jpeg',
+            conditional=True,
+            etag=f'{content_hash}-{size}',
+            max_age=int(expires - time.time())
+        )
+        # Private: browsers may keep it until the link expires, shared caches
+        # must not, since the photo disappears when the user deletes the image.
+        # send_file marks cached responses public, so clear that.
+        response.cache_control.public = False
+        response.cache_control.private = True
+        response.cache_control.immutable = True
+        return response
+        
+    except Exception as e:
+        print(f"Get thumbnail error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/images/<int:image_id>', methods=['DELETE'])
 def delete_image(image_id):
     """Delete a specific image (user can only delete their own)"""
@@ -494,7 +1001,7 @@ def delete_image(image_id):
         
         # Verify image belongs to user
         image = conn.execute(
-            'SELECT user_id FROM images WHERE id = ?', (image_id,)
+            'SELECT user_id, thumbnail_hash FROM images WHERE id = ?', (image_id,)
         ).fetchone()
         
         if not image:
@@ -507,6 +1014,8 @@ def delete_image(image_id):
         
         conn.execute('DELETE FROM images WHERE id = ?', (image_id,))
         conn.commit()
+        
+        delete_unused_thumbnails(conn, [image['thumbnail_hash']])
         conn.close()
         
         return jsonify({'message': 'Image deleted successfully'}), 200
@@ -515,6 +1024,76 @@ def delete_image(image_id):
         print(f"Delete image error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/images/batch', methods=['DELETE'])
+def delete_images_batch():
+    """Delete many images in one request (user can only delete their own)"""
+    try:
+        session_token = get_auth_token()
+        
+        if not session_token:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        user_info = verify_session(session_token)
+        if not user_info:
+            return jsonify({'error': 'Invalid or expired session'}), 401
+        
+        data = request.get_json(silent=True)
+        
+        if not isinstance(data, dict) or not isinstance(data.get('image_ids'), list):
+            return jsonify({'error': 'A list of image ids is required'}), 400
+        
+        image_ids = data['image_ids']
+        
+        if not image_ids:
+            return jsonify({'error': 'A list of image ids is required'}), 400
+        
+        if len(image_ids) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Too many images (max {MAX_BATCH_SIZE} per batch)'}), 400
+        
+        if not all(isinstance(image_id, int) and not isinstance(image_id, bool) for image_id in image_ids):
+            return jsonify({'error': 'Image ids must be integers'}), 400
+        
+        # Drop duplicates but keep the caller's order
+        image_ids = list(dict.fromkeys(image_ids))
+        
+        conn = get_db_connection()
+        conn.execute('BEGIN IMMEDIATE')
+        
+        placeholders = ','.join('?' * len(image_ids))
+        images = {
+            row['id']: row
+            for row in conn.execute(
+                f'SELECT id, user_id, thumbnail_hash FROM images WHERE id IN ({placeholders})',
+                image_ids
+            ).fetchall()
+        }
+        
+        results = []
+        to_delete = []
+        for image_id in image_ids:
+            if image_id not in images:
+                results.append({'image_id': image_id, 'error': 'Image not found'})
+            elif images[image_id]['user_id'] != user_info['user_id']:
+                results.append({'image_id': image_id, 'error': 'Unauthorized to delete this image'})
+            else:
+                results.append({'image_id': image_id, 'deleted': True})
+                to_delete.append((image_id,))
+        
+        conn.executemany('DELETE FROM images WHERE id = ?', to_delete)
+        conn.commit()
+        
+        delete_unused_thumbnails(conn, [images[image_id]['thumbnail_hash'] for (image_id,) in to_delete])
+        conn.close()
+        
+        return jsonify({
+            'message': f'{len(to_delete)} of {len(image_ids)} images deleted successfully',
+            'results': results
+        }), 200
+        
+    except Exception as e:
+        print(f"Batch delete error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/user/stats', methods=['GET'])
 def get_user_stats():
     """Get statistics for authenticated user"""
@@ -571,8 +1150,9 @@ def analyze_image():
         return jsonify({"error": "No selected file"}), 400
     
     file_content: bytes = file.stream.read()
-    identifier = ImageIdentifier(GEMINI_API_KEY)
-    result = identifier.checkImageFile(file_content, description)
+    identifier = get_image_identifier()
+    with model_quota:
+        result = identifier.checkImageFile(file_content, description)
     if (result): 	
         return jsonify({"message": f"{result}", "challenge_success": True}), 200
     else:
@@ -584,9 +1164,6 @@ if __name__ == '__main__':
     print("Starting TouchGrass API Server")
     print("=" * 50)
     
-    # Initialize database on startup
-    init_database()
-    
     # Clean up expired sessions on startup
     cleanup_expired_sessions()
     
@@ -0,0 +1,79 @@
+"""
+Startup benchmark for the TouchGrass API.
+
+Spawns fresh Python interpreters (one per simulated worker) and reports, for
+each one, how long `import app` takes (including the schema check) and how
+long until the first request is served. Run from the api directory:
+
+    python bench_startup.py --workers 4
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Runs inside each spawned worker process
+WORKER_CODE = '''
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+client = app.app.test_client()
+response = client.get('/api/health')
+t2 = time.perf_counter()
+print(json.dumps({
+    'import_ms': (t1 - t0) * 1000,
+    'first_request_ms': (t2 - t0) * 1000,
+    'status': response.status_code,
+    'sdk_loaded': 'google.genai' in sys.modules,
+}))
+'''
+
+def run_worker(env):
+    """Spawn one worker process and return its timings"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-c', WORKER_CODE],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    # App prints startup messages; the timings are on the last line
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings['process_ms'] = wall_ms
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure API worker cold start time')
+    parser.add_argument('--workers', type=int, default=4, help='Number of workers to spawn')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env.setdefault('API_KEY', 'benchmark')
+        env['DATABASE_PATH'] = os.path.join(tmp, 'bench.db')
+
+        results = []
+        for i in range(args.workers):
+            timings = run_worker(env)
+            results.append(timings)
+            print(f"worker {i + 1}: "
+                  f"import {timings['import_ms']:.1f} ms, "
+                  f"first request {timings['first_request_ms']:.1f} ms, "
+                  f"process {timings['process_ms']:.1f} ms, "
+                  f"model SDK loaded: {timings['sdk_loaded']}")
+
+    print("=" * 50)
+    for key in ('import_ms', 'first_request_ms', 'process_ms'):
+        values = [r[key] for r in results]
+        print(f"{key:18} median {statistics.median(values):8.1f} ms   max {max(values):8.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Move cold image data out of the hot database into compressed pack files,
+then rewrite sealed packs to drop the data of deleted images.
+
+Run periodically (e.g. from cron) from the api directory:
+
+    python compact_images.py --older-than-days 30 --vacuum
+"""
+import argparse
+
+import app
+
+def main():
+    parser = argparse.ArgumentParser(description='Compact old image data into pack files')
+    parser.add_argument('--older-than-days', type=int, default=app.RETENTION_DAYS,
+                        help='Compact images older than this many days')
+    parser.add_argument('--min-dead-ratio', type=float, default=0.0,
+                        help='Only rewrite packs where at least this fraction belongs to deleted images')
+    parser.add_argument('--vacuum', action='store_true',
+                        help='VACUUM the database afterwards to return freed pages')
+    args = parser.parse_args()
+
+    compacted = app.compact_images(args.older_than_days)
+    print(f"✅ Compacted {compacted} images into {app.PACK_DIR}")
+
+    # Reclaim records of images deleted since their data was packed
+    reclaimed = app.compact_packs(args.min_dead_ratio)
+    print(f"✅ Reclaimed {reclaimed} bytes of deleted image data")
+
+    # Only compaction frees pages in the database (by dropping image_data);
+    # rewriting packs just repoints rows, so there is nothing to vacuum
+    if args.vacuum and compacted:
+        conn = app.get_db_connection()
+        conn.execute('VACUUM')
+        conn.close()
+        print("✅ Database vacuumed")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+import datetime
+import os
+import secrets
+import tempfile
+
+import pytest
+
+# app.py reads its configuration and migrates the database when imported,
+# so point it at a scratch directory before any test imports it
+_scratch = tempfile.mkdtemp(prefix='touchgrass-tests-')
+os.environ.setdefault('API_KEY', 'test')
+os.environ['DATABASE_PATH'] = os.path.join(_scratch, 'touchgrass.db')
+os.environ['PACK_DIR'] = os.path.join(_scratch, 'packs')
+os.environ['THUMBNAIL_DIR'] = os.path.join(_scratch, 'thumbnails')
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    """The app module, with a fresh database, pack dir and thumbnail dir per test"""
+    pytest.importorskip('flask')
+    pytest.importorskip('flask_cors')
+    import app
+    from ImageArchive import ImageArchive
+
+    monkeypatch.setattr(app, 'DATABASE', str(tmp_path / 'touchgrass.db'))
+    monkeypatch.setattr(app, 'THUMBNAIL_DIR', str(tmp_path / 'thumbnails'))
+    monkeypatch.setattr(app, '_image_archive', ImageArchive(str(tmp_path / 'packs')))
+    app.init_database()
+
+    # Thumbnail generation is tested explicitly; don't start worker processes elsewhere
+    monkeypatch.setattr(app, 'THUMBNAILS_AVAILABLE', False)
+
+    # Rate limits are tested explicitly; keep them out of the way elsewhere
+    if app.LIMITER_AVAILABLE:
+        app.limiter.reset()
+        monkeypatch.setattr(app.limiter, 'enabled', False)
+    return app
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+def create_user(app_module, email='explorer@example.com'):
+    """Insert a user with a live session, returning (user_id, auth headers)"""
+    conn = app_module.get_db_connection()
+    user_id = conn.execute(
+        'INSERT INTO users (email, password_hash) VALUES (?, ?)', (email, 'x')
+    ).lastrowid
+    token = secrets.token_urlsafe(32)
+    conn.execute(
+        'INSERT INTO sessions (user_id, session_token, expires_at) VALUES (?, ?, ?)',
+        (user_id, token, datetime.datetime.now() + datetime.timedelta(days=1))
+    )
+    conn.commit()
+    conn.close()
+    return user_id, {'Authorization': f'Bearer {token}'}
+
+@pytest.fixture
+def user(app_module):
+    return create_user(app_module)
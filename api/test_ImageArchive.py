@@ -0,0 +1,112 @@
+import multiprocessing
+import os
+
+import pytest
+
+from ImageArchive import ImageArchive, RECORD_HEADER
+
+def test_append_and_read_round_trip(tmp_path):
+    archive = ImageArchive(str(tmp_path))
+    records = [(1, 'first image'), (2, 'x' * 10000), (3, '')]
+
+    pointers = archive.append(records)
+
+    assert [pointer[0] for pointer in pointers] == [1, 1, 1]
+    assert pointers[0][1] == 0
+    # Records are laid out back to back
+    assert pointers[1][1] == pointers[0][1] + pointers[0][2]
+    for (image_id, data), (pack_id, offset, length) in zip(records, pointers):
+        assert archive.read(pack_id, offset, length, image_id) == data
+
+def test_read_sees_records_appended_after_mapping(tmp_path):
+    archive = ImageArchive(str(tmp_path))
+    first = archive.append([(1, 'first')])[0]
+    assert archive.read(*first, 1) == 'first'
+
+    second = archive.append([(2, 'second')])[0]
+    assert second[0] == first[0]
+    assert archive.read(*second, 2) == 'second'
+
+def test_read_rejects_pointer_to_another_image(tmp_path):
+    archive = ImageArchive(str(tmp_path))
+    pack_id, offset, length = archive.append([(1, 'first')])[0]
+
+    with pytest.raises(ValueError, match='belongs to image 1'):
+        archive.read(pack_id, offset, length, 2)
+
+def test_read_rejects_bad_length(tmp_path):
+    archive = ImageArchive(str(tmp_path))
+    pack_id, offset, length = archive.append([(1, 'first')])[0]
+
+    with pytest.raises(ValueError, match='Corrupt pack record'):
+        archive.read(pack_id, offset, length + 1, 1)
+
+def test_rollover_starts_new_pack(tmp_path):
+    archive = ImageArchive(str(tmp_path), max_pack_bytes=RECORD_HEADER.size + 1)
+
+    # Within one append
+    pointers = archive.append([(1, 'a'), (2, 'b')])
+    assert [pointer[0] for pointer in pointers] == [1, 2]
+    assert pointers[1][1] == 0
+
+    # Across appends, the full pack is not reopened
+    pointer = archive.append([(3, 'c')])[0]
+    assert pointer[0] == 3
+    assert archive.pack_ids() == [1, 2, 3]
+
+    for image_id, data, (pack_id, offset, length) in zip(
+        [1, 2, 3], ['a', 'b', 'c'], pointers + [pointer]
+    ):
+        assert archive.read(pack_id, offset, length, image_id) == data
+
+def test_sealed_packs_exclude_newest(tmp_path):
+    archive = ImageArchive(str(tmp_path), max_pack_bytes=RECORD_HEADER.size + 1)
+    archive.append([(1, 'a'), (2, 'b'), (3, 'c')])
+
+    assert archive.sealed_pack_ids() == [1, 2]
+
+def test_remove_deletes_pack(tmp_path):
+    archive = ImageArchive(str(tmp_path), max_pack_bytes=RECORD_HEADER.size + 1)
+    pointers = archive.append([(1, 'a'), (2, 'b')])
+    archive.read(*pointers[0], 1)
+
+    archive.remove(1)
+
+    assert archive.pack_ids() == [2]
+    with pytest.raises(FileNotFoundError):
+        archive.read(*pointers[0], 1)
+    # Removing an old pack never causes a pack id to be reused
+    assert archive.append([(3, 'c')])[0][0] == 3
+
+def test_mappings_of_packs_removed_elsewhere_are_closed(tmp_path):
+    reader = ImageArchive(str(tmp_path), max_pack_bytes=RECORD_HEADER.size + 1)
+    pointers = reader.append([(1, 'a'), (2, 'b'), (3, 'c')])
+    reader.read(*pointers[0], 1)
+    assert reader.cached_pack_ids() == [1]
+
+    # e.g. the compaction job, running in another process
+    ImageArchive(str(tmp_path)).remove(1)
+
+    # The next read of any pack notices the removed one and unmaps it
+    assert reader.read(*pointers[1], 2) == 'b'
+    assert reader.cached_pack_ids() == [2]
+
+def _append_from_process(pack_dir, first_id):
+    archive = ImageArchive(pack_dir)
+    return [
+        (first_id + i, pointer)
+        for i, pointer in enumerate(archive.append([(first_id + i, 'y' * 5000) for i in range(50)]))
+    ]
+
+def test_concurrent_processes_get_distinct_offsets(tmp_path):
+    with multiprocessing.Pool(4) as pool:
+        results = pool.starmap(_append_from_process, [(str(tmp_path), n * 1000) for n in range(4)])
+
+    archive = ImageArchive(str(tmp_path))
+    pointers = [entry for result in results for entry in result]
+    assert len({pointer for _, pointer in pointers}) == len(pointers)
+    for image_id, pointer in pointers:
+        assert archive.read(*pointer, image_id) == 'y' * 5000
+
+    # Every byte of the pack belongs to exactly one record
+    assert sum(pointer[2] for _, pointer in pointers) == os.path.getsize(tmp_path / 'pack-000001.tgp')
@@ -0,0 +1,77 @@
+import pytest
+
+from conftest import create_user
+
+def test_upload_rejects_non_object_body(client, user):
+    _, headers = user
+    response = client.post('/api/images/upload', json=[1, 2], headers=headers)
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Request body must be a JSON object'}
+
+@pytest.mark.parametrize('method, path', [
+    ('post', '/api/images/batch'),
+    ('delete', '/api/images/batch'),
+])
+def test_batch_rejects_non_object_body(client, user, method, path):
+    _, headers = user
+    response = getattr(client, method)(path, json=[1, 2], headers=headers)
+
+    assert response.status_code == 400
+
+def test_upload_rejects_non_string_prompt(client, user):
+    _, headers = user
+    response = client.post('/api/images/upload', json={'prompt': None}, headers=headers)
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Prompt must be a string'}
+
+def test_batch_upload_reports_per_item_results(client, user, app_module):
+    user_id, headers = user
+    response = client.post('/api/images/batch', headers=headers, json={'images': [
+        {'prompt': 'a tree', 'image_data': 'aGk='},
+        {'prompt': None, 'image_data': 'aGk='},
+        {'prompt': ' a rock ', 'image_data': 'aGk='},
+    ]})
+
+    assert response.status_code == 201
+    results = response.get_json()['results']
+    assert results[1] == {'index': 1, 'error': 'Prompt must be a string'}
+
+    conn = app_module.get_db_connection()
+    rows = conn.execute('SELECT id, user_id, prompt FROM images ORDER BY id').fetchall()
+    conn.close()
+    assert [tuple(row) for row in rows] == [
+        (results[0]['image_id'], user_id, 'a tree'),
+        (results[2]['image_id'], user_id, 'a rock'),
+    ]
+
+def test_batch_upload_counts_each_image_against_upload_limit(client, user, app_module, monkeypatch):
+    if not app_module.LIMITER_AVAILABLE:
+        pytest.skip('flask-limiter not installed')
+    monkeypatch.setattr(app_module.limiter, 'enabled', True)
+    _, headers = user
+    images = [{'prompt': 'a tree', 'image_data': 'aGk='}] * 15
+
+    assert client.post('/api/images/batch', headers=headers, json={'images': images}).status_code == 201
+    # 15 of the 20 per hour are used; the single upload endpoint shares the same quota
+    for _ in range(5):
+        response = client.post('/api/images/upload', headers=headers, json={'prompt': 'a tree'})
+        assert response.status_code == 201
+    assert client.post('/api/images/upload', headers=headers, json={'prompt': 'a tree'}).status_code == 429
+    assert client.post('/api/images/batch', headers=headers, json={'images': images[:1]}).status_code == 429
+
+def test_batch_delete_only_deletes_own_images(client, user, app_module):
+    _, headers = user
+    _, other_headers = create_user(app_module, 'other@example.com')
+    mine = client.post('/api/images/upload', headers=headers, json={'prompt': 'mine'}).get_json()['image_id']
+    theirs = client.post('/api/images/upload', headers=other_headers, json={'prompt': 'theirs'}).get_json()['image_id']
+
+    response = client.delete('/api/images/batch', headers=headers, json={'image_ids': [mine, theirs, 999]})
+
+    assert response.status_code == 200
+    assert response.get_json()['results'] == [
+        {'image_id': mine, 'deleted': True},
+        {'image_id': theirs, 'error': 'Unauthorized to delete this image'},
+        {'image_id': 999, 'error': 'Image not found'},
+    ]
@@ -0,0 +1,165 @@
+import os
+
+import pytest
+
+from ImageArchive import ImageArchive, RECORD_HEADER
+
+# Identical data compresses to identical record sizes, which makes pack
+# layouts predictable
+IMAGE_DATA = 'aGVsbG8gdG91Y2hncmFzcw==' * 100
+
+def insert_image(app_module, user_id, image_data=IMAGE_DATA, days_old=40):
+    conn = app_module.get_db_connection()
+    image_id = conn.execute(
+        "INSERT INTO images (user_id, prompt, image_data, created_at) VALUES (?, 'a tree', ?, datetime('now', ?))",
+        (user_id, image_data, f'-{days_old} days')
+    ).lastrowid
+    conn.commit()
+    conn.close()
+    return image_id
+
+def get_row(app_module, image_id):
+    conn = app_module.get_db_connection()
+    row = conn.execute('SELECT * FROM images WHERE id = ?', (image_id,)).fetchone()
+    conn.close()
+    return row
+
+def packed_image_ids(pack_dir):
+    """Return the image id of every record in every pack on disk"""
+    image_ids = []
+    for name in sorted(os.listdir(pack_dir)):
+        if not name.endswith('.tgp'):
+            continue
+        with open(os.path.join(pack_dir, name), 'rb') as pack:
+            data = pack.read()
+        offset = 0
+        while offset < len(data):
+            _, image_id, payload_length = RECORD_HEADER.unpack_from(data, offset)
+            image_ids.append(image_id)
+            offset += RECORD_HEADER.size + payload_length
+    return image_ids
+
+@pytest.fixture
+def record_length(app_module):
+    return ImageArchive(app_module._image_archive.pack_dir + '-probe').append([(1, IMAGE_DATA)])[0][2]
+
+@pytest.fixture
+def archive(app_module, tmp_path, monkeypatch, record_length):
+    """An archive that rolls over to a new pack every three records"""
+    archive = ImageArchive(str(tmp_path / 'small-packs'), max_pack_bytes=3 * record_length)
+    monkeypatch.setattr(app_module, '_image_archive', archive)
+    return archive
+
+def test_compaction_moves_only_old_images(client, user, app_module, archive):
+    user_id, headers = user
+    old = insert_image(app_module, user_id, IMAGE_DATA + 'old')
+    recent = insert_image(app_module, user_id, IMAGE_DATA + 'recent', days_old=1)
+
+    assert app_module.compact_images(30) == 1
+    assert app_module.compact_images(30) == 0
+
+    old_row, recent_row = get_row(app_module, old), get_row(app_module, recent)
+    assert old_row['image_data'] is None
+    assert old_row['pack_id'] == 1
+    assert recent_row['image_data'] == IMAGE_DATA + 'recent'
+    assert recent_row['pack_id'] is None
+
+    # Both are served the same way, from the pack and from the hot row
+    for image_id, data in [(old, IMAGE_DATA + 'old'), (recent, IMAGE_DATA + 'recent')]:
+        response = client.get(f'/api/images/{image_id}', headers=headers)
+        assert response.status_code == 200
+        assert response.get_json()['image_data'] == data
+
+def test_compaction_leaves_rows_packed_concurrently_alone(user, app_module, archive, monkeypatch):
+    user_id, _ = user
+    image_id = insert_image(app_module, user_id)
+    real_append = archive.append
+
+    def append_racing_another_compaction(records):
+        # Another compaction run packs the row between our SELECT and UPDATE
+        conn = app_module.get_db_connection()
+        conn.execute(
+            'UPDATE images SET image_data = NULL, pack_id = 99, pack_offset = 0, pack_length = 1 WHERE id = ?',
+            (image_id,)
+        )
+        conn.commit()
+        conn.close()
+        return real_append(records)
+
+    monkeypatch.setattr(archive, 'append', append_racing_another_compaction)
+    app_module.compact_images(30)
+
+    row = get_row(app_module, image_id)
+    assert (row['pack_id'], row['pack_offset'], row['pack_length']) == (99, 0, 1)
+
+def test_compact_packs_respects_dead_ratio(user, app_module, archive, record_length):
+    user_id, _ = user
+    image_ids = [insert_image(app_module, user_id) for _ in range(4)]
+    app_module.compact_images(30)
+    assert archive.pack_ids() == [1, 2]
+
+    conn = app_module.get_db_connection()
+    conn.execute('DELETE FROM images WHERE id = ?', (image_ids[0],))
+    conn.commit()
+    conn.close()
+
+    # One of three records in pack 1 is dead
+    assert app_module.compact_packs(min_dead_ratio=0.5) == 0
+    assert archive.pack_ids() == [1, 2]
+
+    # Live records of pack 1 are copied into pack 2, which still has room
+    assert app_module.compact_packs(min_dead_ratio=0.3) == record_length
+    assert archive.pack_ids() == [2]
+    assert sorted(packed_image_ids(archive.pack_dir)) == image_ids[1:]
+    for image_id in image_ids[1:]:
+        assert app_module.get_image_data(get_row(app_module, image_id)) == IMAGE_DATA
+
+    # Nothing left to reclaim
+    assert app_module.compact_packs() == 0
+
+def test_compact_packs_leaves_rows_repointed_concurrently_alone(user, app_module, archive, monkeypatch):
+    user_id, _ = user
+    image_ids = [insert_image(app_module, user_id) for _ in range(4)]
+    app_module.compact_images(30)
+    conn = app_module.get_db_connection()
+    conn.execute('DELETE FROM images WHERE id = ?', (image_ids[0],))
+    conn.commit()
+    conn.close()
+    real_append = archive.append
+
+    def append_racing_another_rewrite(records):
+        # Another run moves one of the records between our SELECT and UPDATE
+        conn = app_module.get_db_connection()
+        conn.execute('UPDATE images SET pack_id = 99 WHERE id = ?', (image_ids[1],))
+        conn.commit()
+        conn.close()
+        return real_append(records)
+
+    monkeypatch.setattr(archive, 'append', append_racing_another_rewrite)
+    app_module.compact_packs()
+
+    assert get_row(app_module, image_ids[1])['pack_id'] == 99
+    assert get_row(app_module, image_ids[2])['pack_id'] == 2
+
+def test_batch_delete_then_compaction_removes_deleted_data(client, user, app_module, archive):
+    user_id, headers = user
+    first_batch = [insert_image(app_module, user_id) for _ in range(6)]
+    app_module.compact_images(30)
+
+    deleted = first_batch[:2] + first_batch[4:]
+    response = client.delete('/api/images/batch', headers=headers, json={'image_ids': deleted})
+    assert response.status_code == 200
+
+    # More images age out after the delete and are compacted in the same run
+    second_batch = [insert_image(app_module, user_id) for _ in range(2)]
+    assert app_module.compact_images(30) == 2
+    app_module.compact_packs()
+
+    # Packs 1 and 2 held the first batch; their live records were copied
+    # after the second batch, and the old packs removed
+    kept = first_batch[2:4] + second_batch
+    assert archive.pack_ids() == [3, 4]
+    assert packed_image_ids(archive.pack_dir) == second_batch + kept[:2]
+    for image_id in kept:
+        response = client.get(f'/api/images/{image_id}', headers=headers)
+        assert response.get_json()['image_data'] == IMAGE_DATA
@@ -0,0 +1,162 @@
+import base64
+import io
+import os
+import re
+import time
+
+import pytest
+
+from ImageThumbnailer import THUMBNAIL_SIZES, generate_thumbnails, remove_thumbnails, thumbnail_path
+
+CONTENT_HASH = 'ab' * 32
+
+@pytest.fixture
+def thumbnail(app_module, user):
+    """An image of the user's with thumbnail files on disk; returns its id"""
+    user_id, _ = user
+    os.makedirs(app_module.THUMBNAIL_DIR, exist_ok=True)
+    for size in THUMBNAIL_SIZES:
+        with open(thumbnail_path(app_module.THUMBNAIL_DIR, CONTENT_HASH, size), 'wb') as f:
+            f.write(b'thumbnail %d' % size)
+
+    conn = app_module.get_db_connection()
+    image_id = conn.execute(
+        "INSERT INTO images (user_id, prompt, thumbnail_hash) VALUES (?, 'a tree', ?)",
+        (user_id, CONTENT_HASH)
+    ).lastrowid
+    conn.commit()
+    conn.close()
+    return image_id
+
+def listed_thumbnail_url(client, headers, size=256):
+    images = client.get('/api/images/user', headers=headers).get_json()['images']
+    return images[0]['thumbnails'][str(size)]
+
+def test_signed_link_works_without_auth_and_is_only_privately_cached(client, user, thumbnail):
+    _, headers = user
+    url = listed_thumbnail_url(client, headers)
+
+    # No Authorization header, as for a plain <img src>
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert response.data == b'thumbnail 256'
+    match = re.fullmatch(r'max-age=(\d+), private, immutable', response.headers['Cache-Control'])
+    assert match, response.headers['Cache-Control']
+    expires = int(re.search(r'expires=(\d+)', url).group(1))
+    assert expires - time.time() - 2 <= int(match.group(1)) <= expires - time.time()
+
+def test_link_url_is_stable_across_requests(client, user, thumbnail):
+    _, headers = user
+    assert listed_thumbnail_url(client, headers) == listed_thumbnail_url(client, headers)
+
+def test_range_requests_are_supported(client, user, thumbnail):
+    _, headers = user
+    response = client.get(listed_thumbnail_url(client, headers), headers={'Range': 'bytes=0-8'})
+
+    assert response.status_code == 206
+    assert response.data == b'thumbnail'
+
+def test_tampered_or_expired_links_are_rejected(client, user, thumbnail, app_module):
+    _, headers = user
+    url = listed_thumbnail_url(client, headers)
+
+    assert client.get(url.replace('/256?', '/512?')).status_code == 403
+    assert client.get(url[:-1] + ('0' if url[-1] != '0' else '1')).status_code == 403
+
+    expired = int(time.time()) - 1
+    sig = app_module.sign_thumbnail(CONTENT_HASH, 256, expired)
+    assert client.get(f'/api/thumbnails/{CONTENT_HASH}/256?expires={expired}&sig={sig}').status_code == 403
+
+def test_deleting_image_removes_thumbnails_and_revokes_links(client, user, thumbnail, app_module):
+    _, headers = user
+    url = listed_thumbnail_url(client, headers)
+
+    assert client.delete(f'/api/images/{thumbnail}', headers=headers).status_code == 200
+
+    assert client.get(url).status_code == 404
+    for size in THUMBNAIL_SIZES:
+        assert not os.path.exists(thumbnail_path(app_module.THUMBNAIL_DIR, CONTENT_HASH, size))
+
+def test_thumbnails_shared_by_another_image_are_kept(client, user, thumbnail, app_module):
+    user_id, headers = user
+    conn = app_module.get_db_connection()
+    conn.execute("INSERT INTO images (user_id, prompt, thumbnail_hash) VALUES (?, 'same photo', ?)", (user_id, CONTENT_HASH))
+    conn.commit()
+    conn.close()
+
+    assert client.delete(f'/api/images/{thumbnail}', headers=headers).status_code == 200
+
+    assert client.get(listed_thumbnail_url(client, headers)).status_code == 200
+
+# Thumbnail generation in the worker pool
+
+def png_base64(width=1200, height=800):
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (40, 160, 60)).save(buffer, 'PNG')
+    return base64.b64encode(buffer.getvalue()).decode()
+
+def generate_then_lose_files(image_data, thumb_dir):
+    """
+    Generate thumbnails, then remove them the first time, as if another image
+    with the same content had been deleted before this job's hash was stored
+    """
+    content_hash = generate_thumbnails(image_data, thumb_dir)
+    marker = os.path.join(thumb_dir, 'lost-once')
+    if not os.path.exists(marker):
+        open(marker, 'w').close()
+        remove_thumbnails(thumb_dir, content_hash)
+    return content_hash
+
+@pytest.fixture
+def thumbnail_pool(app_module, monkeypatch):
+    pytest.importorskip('PIL')
+    monkeypatch.setattr(app_module, 'THUMBNAILS_AVAILABLE', True)
+    monkeypatch.setattr(app_module, '_thumbnail_pool', None)
+    yield
+    if app_module._thumbnail_pool is not None:
+        app_module._thumbnail_pool.shutdown()
+
+def wait_for_thumbnail_hash(app_module, image_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        conn = app_module.get_db_connection()
+        row = conn.execute('SELECT thumbnail_hash FROM images WHERE id = ?', (image_id,)).fetchone()
+        conn.close()
+        if row['thumbnail_hash']:
+            return row['thumbnail_hash']
+        time.sleep(0.05)
+    raise AssertionError('thumbnails were not generated')
+
+def test_upload_generates_thumbnails_in_background(client, user, app_module, thumbnail_pool):
+    from PIL import Image
+    _, headers = user
+    image_id = client.post('/api/images/upload', headers=headers, json={
+        'prompt': 'grass', 'image_data': 'data:image/png;base64,' + png_base64()
+    }).get_json()['image_id']
+
+    content_hash = wait_for_thumbnail_hash(app_module, image_id)
+
+    for size in THUMBNAIL_SIZES:
+        with Image.open(thumbnail_path(app_module.THUMBNAIL_DIR, content_hash, size)) as image:
+            assert max(image.size) == size
+
+def test_thumbnails_removed_before_hash_is_stored_are_regenerated(user, app_module, thumbnail_pool, monkeypatch):
+    user_id, _ = user
+    image_data = png_base64()
+    conn = app_module.get_db_connection()
+    image_id = conn.execute(
+        "INSERT INTO images (user_id, prompt, image_data) VALUES (?, 'grass', ?)", (user_id, image_data)
+    ).lastrowid
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(app_module, 'generate_thumbnails', generate_then_lose_files)
+
+    app_module.schedule_thumbnails(image_id, image_data)
+    content_hash = wait_for_thumbnail_hash(app_module, image_id)
+
+    deadline = time.time() + 30
+    while not os.path.exists(thumbnail_path(app_module.THUMBNAIL_DIR, content_hash, 512)):
+        assert time.time() < deadline, 'thumbnails were not regenerated'
+        time.sleep(0.05)